@@ -1,12 +1,15 @@
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import requests
 import numpy as np
 import backoff
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, List
 import os
-from utils import file_lock
+from utils import file_lock, _read_last_timestamps
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +17,20 @@ class HistoricalDataManager:
     COINGECKO_HIST_URL = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart/range"
     BATCH_SIZE = 1440  # Number of minutes to fetch per request
     MIN_REQUEST_INTERVAL = 1.5  # Minimum seconds between requests
+    MAX_CONCURRENT_REQUESTS = 3  # Batches in flight at once
     MAX_RETRIES = 3
     MILLISECONDS_THRESHOLD = 1e12  # Used to detect millisecond timestamps
 
     def __init__(self, raw_data_path: str):
         self.raw_data_path = raw_data_path
         self.last_request_time = 0
+        self._rate_limit_lock = threading.Lock()
+        
+        # Persistent session sized for the concurrent batch fetches
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.MAX_CONCURRENT_REQUESTS
+        ))
         
         # Validate path
         if not os.path.exists(os.path.dirname(raw_data_path)):
@@ -28,20 +39,22 @@ class HistoricalDataManager:
     def get_last_timestamp(self) -> Optional[int]:
         """Read the last timestamp from the raw data file"""
         try:
-            df = pd.read_csv(self.raw_data_path)
-            if not df.empty:
-                return int(df['Timestamp'].iloc[-1])
-            return None
+            timestamps = _read_last_timestamps(self.raw_data_path)
+            return timestamps[0] if timestamps else None
         except Exception as e:
             logger.error(f"Error reading last timestamp: {str(e)}")
             return None
 
     def _wait_for_rate_limit(self):
         """Ensure we don't exceed CoinGecko's rate limit"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.MIN_REQUEST_INTERVAL:
-            time.sleep(self.MIN_REQUEST_INTERVAL - elapsed)
-        self.last_request_time = time.time()
+        # Reserve the next request slot under the lock, then sleep outside it
+        # so concurrent workers queue up at MIN_REQUEST_INTERVAL spacing
+        with self._rate_limit_lock:
+            now = time.time()
+            slot = max(now, self.last_request_time + self.MIN_REQUEST_INTERVAL)
+            self.last_request_time = slot
+        if slot > now:
+            time.sleep(slot - now)
 
     @backoff.on_exception(
         backoff.expo,
@@ -58,10 +71,12 @@ class HistoricalDataManager:
             'to': to_ts
         }
 
-        response = requests.get(self.COINGECKO_HIST_URL, params=params)
+        response = self.session.get(self.COINGECKO_HIST_URL, params=params)
         if response.status_code == 429:  # Rate limit exceeded
             logger.warning("Rate limit exceeded, waiting longer...")
-            time.sleep(60)  # Wait a minute before retry
+            # Push the shared schedule back a minute so every worker waits, not just this one
+            with self._rate_limit_lock:
+                self.last_request_time = max(self.last_request_time, time.time() + 60)
             raise requests.exceptions.RequestException("Rate limit exceeded")
             
         if response.status_code != 200:
@@ -75,25 +90,28 @@ class HistoricalDataManager:
 
         return data['prices']
 
-    def process_api_data(self, price_data: List) -> Dict:
-        """Convert CoinGecko price data to our CSV format"""
-        timestamp, price = price_data
+    def _batch_to_frame(self, price_data: List, after_ts: int) -> pd.DataFrame:
+        """Convert CoinGecko price points newer than after_ts to our CSV format"""
+        arr = np.asarray(price_data, dtype=np.float64).reshape(-1, 2)
         # Convert milliseconds to seconds if necessary
-        timestamp = int(timestamp / 1000) if timestamp > 1e12 else int(timestamp)
-        
-        return {
-            'Timestamp': timestamp,
-            'Open': price,
-            'High': price,
-            'Low': price,
-            'Close': price,
+        timestamps = np.where(
+            arr[:, 0] > self.MILLISECONDS_THRESHOLD, arr[:, 0] / 1000, arr[:, 0]
+        )
+        mask = timestamps > after_ts
+        timestamps = timestamps[mask].astype(np.int64)
+        prices = arr[mask, 1]
+
+        return pd.DataFrame({
+            'Timestamp': timestamps,
+            'Open': prices,
+            'High': prices,
+            'Low': prices,
+            'Close': prices,
             'Volume': np.nan
-        }
+        })
 
-    def append_to_csv(self, data: List[Dict]):
+    def append_to_csv(self, df: pd.DataFrame):
         """Append new data to the CSV file with file locking"""
-        df = pd.DataFrame(data)
-        
         with file_lock(self.raw_data_path):
             df.to_csv(self.raw_data_path, mode='a', header=False, index=False)
 
@@ -112,32 +130,34 @@ class HistoricalDataManager:
 
             logger.info(f"Fetching historical data from {last_timestamp} to {current_time}")
             
+            ranges = []
             current_ts = last_timestamp + 60
-            all_new_data = []
-            
             while current_ts < current_time:
                 batch_end = min(current_ts + self.BATCH_SIZE * 60, current_time)
+                ranges.append((current_ts, batch_end))
+                current_ts = batch_end + 60
+
+            batches: List[pd.DataFrame] = []
+            with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS) as executor:
+                futures = [
+                    executor.submit(self.fetch_historical_batch, from_ts, to_ts)
+                    for from_ts, to_ts in ranges
+                ]
                 
-                try:
-                    batch_data = self.fetch_historical_batch(current_ts, batch_end)
-                    processed_data = [
-                        self.process_api_data(point) 
-                        for point in batch_data 
-                        if (point[0] / 1000 if point[0] > 1e12 else point[0]) > last_timestamp
-                    ]
-                    
-                    all_new_data.extend(processed_data)
-                    current_ts = batch_end + 60
-                    
-                except Exception as e:
-                    logger.error(f"Error processing batch: {str(e)}")
-                    current_ts = batch_end + 60
-                    continue
+                for future in as_completed(futures):
+                    try:
+                        batch_df = self._batch_to_frame(future.result(), last_timestamp)
+                        if not batch_df.empty:
+                            batches.append(batch_df)
+                    except Exception as e:
+                        logger.error(f"Error processing batch: {str(e)}")
             
-            if all_new_data:
-                all_new_data.sort(key=lambda x: x['Timestamp'])
-                self.append_to_csv(all_new_data)
-                logger.info(f"Added {len(all_new_data)} new historical data points")
+            if batches:
+                new_df = pd.concat(batches, ignore_index=True).sort_values(
+                    'Timestamp', kind='mergesort'
+                )
+                self.append_to_csv(new_df)
+                logger.info(f"Added {len(new_df)} new historical data points")
             
             return True
 
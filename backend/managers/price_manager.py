@@ -1,38 +1,53 @@
+import atexit
 import logging
-from typing import List, Optional, Dict
+import threading
+import numpy as np
+from typing import Optional, Dict
+from utils import MA111_WINDOW, MA350_WINDOW
 
 logger = logging.getLogger(__name__)
 
-MINUTES_PER_DAY = 24 * 60
-MA111_WINDOW = 111 * MINUTES_PER_DAY
-MA350_WINDOW = 350 * MINUTES_PER_DAY
+_INV_MA111_WINDOW = 1.0 / MA111_WINDOW
+_INV_MA350_WINDOW = 1.0 / MA350_WINDOW
 
 class PriceManager:
-    def __init__(self, initial_prices: Optional[List[float]] = None):
+    def __init__(self, initial_prices: Optional[np.ndarray] = None, output_path: Optional[str] = None):
         """
         Initialize PriceManager with optional historical prices.
         
         Args:
-            initial_prices: Optional list of historical prices for the last 350 days
+            initial_prices: Optional array of historical prices for the last 350 days
+            output_path: Optional processed CSV that new price rows are appended to
         """
-        if initial_prices and len(initial_prices) != MA350_WINDOW:
-            raise ValueError(
-                f"Initial prices must contain exactly {MA350_WINDOW} values "
-                f"(350 days worth of minute data)"
-            )
-            
-        self.prices_350d = initial_prices
+        # Fixed-size ring buffer; self.head points at the oldest price
+        self.prices_350d: Optional[np.ndarray] = None
+        if initial_prices is not None:
+            self.prices_350d = np.array(initial_prices, dtype=np.float64)
+            if self.prices_350d.shape != (MA350_WINDOW,):
+                raise ValueError(
+                    f"Initial prices must contain exactly {MA350_WINDOW} values "
+                    f"(350 days worth of minute data)"
+                )
+
+        self.head = 0
         self.latest_price: Optional[float] = None
         self.moving_averages: Dict[str, Optional[float]] = {'MA111': None, 'MA350': None}
         
         # Initialize sums if we have initial prices
-        if initial_prices:
-            self.sum_350 = sum(initial_prices)
-            self.sum_111 = sum(initial_prices[-(MA111_WINDOW):])
+        if self.prices_350d is not None:
+            self.sum_350 = float(self.prices_350d.sum())
+            self.sum_111 = float(self.prices_350d[-MA111_WINDOW:].sum())
         else:
             self.sum_350 = 0.0
             self.sum_111 = 0.0
 
+        # Keep the output file open between updates; the scheduler runs in
+        # this process, so a thread lock is enough to serialize writes
+        self._write_lock = threading.Lock()
+        self._out = open(output_path, 'a', buffering=1) if output_path else None
+        if self._out:
+            atexit.register(self.close)
+
     def update_moving_averages(self, new_price: float) -> None:
         """
         Update moving averages with new price data.
@@ -43,19 +58,42 @@ class PriceManager:
         if not isinstance(new_price, (int, float)):
             raise ValueError("Price must be a number")
 
-        self.prices_350d.append(new_price)
-        self.sum_350 += new_price
+        if self.prices_350d is None:
+            raise ValueError("Not enough data points for 350-day moving average")
 
-        # Remove the oldest price if the list exceeds 350 days
-        if len(self.prices_350d) > MA350_WINDOW:
-            oldest_price = self.prices_350d.pop(0)
-            self.sum_350 -= oldest_price
+        # Capture the prices leaving each window before overwriting the slot.
+        # item() returns plain floats so the arithmetic below avoids NumPy
+        # scalar overhead; a negative index wraps around the buffer.
+        buf = self.prices_350d
+        head = self.head
+        oldest_350 = buf.item(head)
+        oldest_111 = buf.item(head - MA111_WINDOW)
+        buf[head] = new_price
+        self.head = head + 1 if head + 1 < MA350_WINDOW else 0
 
-        # Update the sum for the 111-day window
-        if len(self.prices_350d) < MA350_WINDOW:
-            raise ValueError("Not enough data points for 350-day moving average")
+        self.sum_350 = sum_350 = self.sum_350 + (new_price - oldest_350)
+        self.sum_111 = sum_111 = self.sum_111 + (new_price - oldest_111)
+        self.moving_averages['MA111'] = sum_111 * _INV_MA111_WINDOW
+        self.moving_averages['MA350'] = sum_350 * _INV_MA350_WINDOW
+
+    def append_row(self, timestamp: int, price: float, ma111: float, ma350: float) -> None:
+        """
+        Append a price row to the processed data file.
+        
+        Args:
+            timestamp: Unix timestamp in seconds
+            price: The latest BTC price
+            ma111: Current 111-day moving average
+            ma350: Current 350-day moving average
+        """
+        if self._out is None:
+            raise ValueError("PriceManager was created without an output path")
+
+        with self._write_lock:
+            self._out.write(f"{timestamp},{price},{ma111},{ma350}\n")
 
-        self.sum_111 -= self.prices_350d[-MA111_WINDOW - 1]
-        self.sum_111 += new_price
-        self.moving_averages['MA111'] = self.sum_111 / MA111_WINDOW
-        self.moving_averages['MA350'] = self.sum_350 / MA350_WINDOW
+    def close(self) -> None:
+        """Close the processed data file if it is open"""
+        with self._write_lock:
+            if self._out and not self._out.closed:
+                self._out.close()
@@ -1,14 +1,14 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
-import requests
 from flask import Flask, jsonify
 from apscheduler.schedulers.background import BackgroundScheduler
 import subprocess
 import logging
 from managers.price_manager import PriceManager
 from managers.historical_manager import HistoricalDataManager
-from utils import KaggleDataDownloader, file_lock, process_historical_data, load_initial_prices, get_missing_data
+from utils import KaggleDataDownloader, process_historical_data, load_initial_prices, get_missing_data, http_session
 
 # Constants
 RAW_DATA_DIR = "data/raw/btc_usd"
@@ -55,6 +55,9 @@ logger = logging.getLogger(__name__)
 # Initialize managers
 price_manager = PriceManager()
 
+# Worker pool for concurrent price lookups
+price_executor = ThreadPoolExecutor(max_workers=len(PRICE_APIS))
+
 def check_and_download_historical():
     """Check if historical data exists and download if needed"""
     downloader = KaggleDataDownloader(download_dir=RAW_DATA_DIR)
@@ -83,21 +86,38 @@ def check_and_download_historical():
     if not os.path.exists(RAW_DATA_PATH):
         raise FileNotFoundError("Historical data file not found after download")
 
+def _fetch_price(api_config):
+    """Fetch and parse the latest price from a single API"""
+    response = http_session.get(api_config['url'], params=api_config['params'], timeout=5)
+    data = response.json()
+    
+    # Navigate through the response to get the price
+    price = data
+    for key in api_config['price_key']:
+        price = price[key]
+    
+    return float(price)
+
 def get_latest_price():
-    """Try multiple APIs to get the latest price"""
-    for api_name, api_config in PRICE_APIS.items():
-        try:
-            response = requests.get(api_config['url'], params=api_config['params'], timeout=5)
-            data = response.json()
-            
-            # Navigate through the response to get the price
-            price = data
-            for key in api_config['price_key']:
-                price = price[key]
+    """Query all APIs concurrently and return the first price that comes back"""
+    futures = {
+        price_executor.submit(_fetch_price, api_config): api_name
+        for api_name, api_config in PRICE_APIS.items()
+    }
+    
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                price = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching price from {futures[future]}: {str(e)}")
+                continue
             
-            return float(price)
-        except Exception as e:
-            logger.error(f"Error fetching price from {api_name}: {str(e)}")
+            for other in pending:
+                other.cancel()
+            return price
     
     raise Exception("All APIs failed to return price")
 
@@ -108,11 +128,12 @@ def update_price(price_manager):
         price_manager.latest_price = new_price
         price_manager.update_moving_averages(new_price)
         
-        # Use file lock when writing to the CSV
-        with file_lock(PROCESSED_DATA_PATH):
-            timestamp = int(time.time())
-            with open(PROCESSED_DATA_PATH, 'a') as f:
-                f.write(f"{timestamp},{new_price},{price_manager.moving_averages['MA111']},{price_manager.moving_averages['MA350']}\n")
+        price_manager.append_row(
+            int(time.time()),
+            new_price,
+            price_manager.moving_averages['MA111'],
+            price_manager.moving_averages['MA350']
+        )
             
         logger.info(f"Updated price: ${new_price:.2f}")
     except Exception as e:
@@ -147,7 +168,7 @@ def initialize_server():
     # Load initial prices into PriceManager
     try:
         initial_prices = load_initial_prices(PROCESSED_DATA_PATH)
-        price_manager = PriceManager(initial_prices=initial_prices)
+        price_manager = PriceManager(initial_prices=initial_prices, output_path=PROCESSED_DATA_PATH)
     except Exception as e:
         raise RuntimeError(f"Failed to initialize price manager: {str(e)}")
 
@@ -1,21 +1,67 @@
+import io
 import math
 import os
+import json
 import fcntl
+import time
 import logging
+import threading
 import contextlib
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Iterator
 from kaggle.api.kaggle_api_extended import KaggleApi
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import requests
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session so repeated API calls reuse pooled keep-alive connections
+http_session = requests.Session()
+
+PROCESSED_COLUMNS = ['Timestamp', 'price', 'MA111', 'MA350']
+
+# Moving-average windows in minutes, since the data is minute-by-minute
+MINUTES_PER_DAY = 24 * 60
+MA111_WINDOW = 111 * MINUTES_PER_DAY
+MA350_WINDOW = 350 * MINUTES_PER_DAY
+
+# Timestamp is read as float so blank rows survive as NaN and can be dropped
+RAW_DTYPES = {
+    'Timestamp': 'float64',
+    'Open': 'float32',
+    'High': 'float32',
+    'Low': 'float32',
+    'Close': 'float32'
+}
+RAW_ARROW_TYPES = {name: pa.from_numpy_dtype(np.dtype(dtype)) for name, dtype in RAW_DTYPES.items()}
+
+# Lock file descriptors are kept open for the life of the process and shared
+# between threads, so each one is paired with a thread lock (flock alone does
+# not exclude other threads using the same descriptor)
+_lock_fds: Dict[str, Tuple[int, threading.Lock]] = {}
+_lock_fds_guard = threading.Lock()
+
+def _get_lock_fd(filename: str) -> Tuple[int, threading.Lock]:
+    """Return the cached lock file descriptor and thread lock for filename"""
+    key = os.path.realpath(filename)
+    with _lock_fds_guard:
+        if key not in _lock_fds:
+            fd = os.open(f"{key}.lock", os.O_CREAT | os.O_RDWR, 0o644)
+            _lock_fds[key] = (fd, threading.Lock())
+        return _lock_fds[key]
+
 @contextlib.contextmanager
 def file_lock(filename: str, timeout: Optional[float] = None):
     """
     Context manager for file locking to prevent concurrent access.
     
+    The lock file is never removed: unlinking it on release would let another
+    process lock a stale inode while a third creates a fresh one.
+    
     Args:
         filename: Path to the file to lock
         timeout: Optional timeout in seconds. None means wait indefinitely
@@ -27,22 +73,29 @@ def file_lock(filename: str, timeout: Optional[float] = None):
         TimeoutError: If timeout is specified and lock cannot be acquired
         IOError: If lock file cannot be created or other IO errors occur
     """
-    lock_file = f"{filename}.lock"
-    lock_fd = None
+    fd, thread_lock = _get_lock_fd(filename)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if not thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise TimeoutError(f"Could not acquire lock on {filename}")
     try:
-        # Open the lock file for locking
-        lock_fd = open(lock_file, 'w')
-        fcntl.flock(lock_fd.fileno(), fcntl.LOCK_EX)
-        yield
+        if deadline is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # flock has no timeout of its own, so poll it until the deadline
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Could not acquire lock on {filename}")
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
     finally:
-        # Unlock and close the lock file
-        if lock_fd:
-            try:
-                fcntl.flock(lock_fd.fileno(), fcntl.LOCK_UN)
-                lock_fd.close()
-                os.remove(lock_file)
-            except (IOError, OSError) as e:
-                logger.error(f"Error releasing file lock: {str(e)}")
+        thread_lock.release()
 
 class KaggleDataDownloader:
     def __init__(self, download_dir: str):
@@ -50,12 +103,25 @@ class KaggleDataDownloader:
         self.download_dir = download_dir
         self.filename = "btcusd_1-min_data.csv"
         self.download_path = os.path.join(download_dir, self.filename)
+        self.parquet_path = parquet_snapshot_path(self.download_path)
+        self._api: Optional[KaggleApi] = None
+        self._remote_size: Optional[int] = None
+
+    @property
+    def api(self) -> KaggleApi:
+        """Authenticated Kaggle API client, created on first use"""
+        if self._api is None:
+            logger.info("Authenticating with Kaggle...")
+            self._api = KaggleApi()
+            self._api.authenticate()
+        return self._api
 
     def get_dataset_size(self) -> Optional[int]:
         """Check the size of the dataset on Kaggle before downloading."""
-        logger.info("Authenticating with Kaggle...")
-        api = KaggleApi()
-        api.authenticate()
+        if self._remote_size is not None:
+            return self._remote_size
+
+        api = self.api
 
         logger.info(f"Fetching metadata for dataset: {self.dataset_slug}...")
         try:
@@ -76,6 +142,7 @@ class KaggleDataDownloader:
                 total_bytes = int(number * multipliers.get(unit, 1))
                 total_size_mb = total_bytes / (1024 * 1024)
                 logger.info(f"Remote file size: {total_size_mb:.2f} MB")
+                self._remote_size = total_bytes
                 return total_bytes
             return None
         except Exception as e:
@@ -108,27 +175,292 @@ class KaggleDataDownloader:
 
         logger.info(f"Remote file is larger. Proceeding to download...")
         
-        api = KaggleApi()
-        api.authenticate()
-        
         os.makedirs(self.download_dir, exist_ok=True)
 
+        # The download replaces the CSV, so a snapshot of the old one must not outlive it
+        self._remove_parquet()
+
         try:
-            api.dataset_download_files(
+            self.api.dataset_download_files(
                 self.dataset_slug, 
                 path=self.download_dir, 
                 unzip=True
             )
             logger.info("Download complete!")
-            return True
         except Exception as e:
             logger.error(f"Error downloading dataset: {str(e)}")
             return False
 
+        self.convert_to_parquet()
+        return True
+
+    def convert_to_parquet(self) -> bool:
+        """
+        Write a Parquet snapshot of the downloaded CSV for faster reloads.
+        
+        The CSV keeps receiving appended rows, so the snapshot records the CSV
+        size it was taken at and the line ending there; readers check that line
+        and parse only the bytes appended since.
+        
+        Returns:
+            bool: True if the snapshot was written, False otherwise
+        """
+        try:
+            logger.info(f"Converting {self.download_path} to Parquet...")
+            csv_size = os.path.getsize(self.download_path)
+            # Store OHLC as float32 so snapshot reads move half the bytes
+            table = pacsv.read_csv(
+                self.download_path,
+                convert_options=pacsv.ConvertOptions(column_types=RAW_ARROW_TYPES)
+            )
+            csv_tail = _line_before(self.download_path, csv_size) or ''
+            table = table.replace_schema_metadata({
+                b'csv_size': str(csv_size).encode(),
+                b'csv_tail': csv_tail.encode()
+            })
+            pq.write_table(table, self.parquet_path, compression='snappy')
+            logger.info(f"Parquet snapshot written to {self.parquet_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error converting dataset to Parquet: {str(e)}")
+            self._remove_parquet()
+            return False
+
+    def _remove_parquet(self):
+        """Delete the Parquet snapshot so readers fall back to the CSV"""
+        try:
+            os.remove(self.parquet_path)
+        except FileNotFoundError:
+            pass
+
+def parquet_snapshot_path(csv_path: str) -> str:
+    """Return the path of the Parquet snapshot kept next to a raw CSV file"""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def _open_raw_csv(source, column_names: Optional[List[str]] = None) -> pacsv.CSVStreamingReader:
+    """Open a streaming PyArrow reader over raw CSV data, keeping only RAW_DTYPES columns"""
+    return pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(column_names=column_names, block_size=1 << 24),
+        convert_options=pacsv.ConvertOptions(
+            column_types=RAW_ARROW_TYPES,
+            include_columns=list(RAW_DTYPES)
+        )
+    )
+
+def _iter_csv_from(input_path: str, offset: int) -> Iterator[pa.RecordBatch]:
+    """Yield record batches of the raw CSV rows starting at a line-aligned byte offset"""
+    with open(input_path, 'rb') as f:
+        # pyarrow rejects an empty stream, so there is nothing to yield at EOF
+        if offset >= os.fstat(f.fileno()).st_size:
+            return
+        names = f.readline().decode().strip().split(',')
+        f.seek(offset)
+        yield from _open_raw_csv(f, column_names=names)
+
+def _iter_raw_batches(input_path: str, start_offset: int = 0) -> Iterator[pa.RecordBatch]:
+    """
+    Yield record batches of the Timestamp and OHLC columns of the raw data file.
+    
+    With a non-zero start_offset only the CSV rows from that byte onwards are
+    read. Otherwise uses the Parquet snapshot when one exists and only parses
+    CSV rows appended after it was taken, or streams the whole CSV.
+    """
+    if start_offset > 0:
+        yield from _iter_csv_from(input_path, start_offset)
+        return
+
+    parquet_path = parquet_snapshot_path(input_path)
+
+    if os.path.exists(parquet_path):
+        metadata = pq.read_schema(parquet_path).metadata or {}
+        csv_size = int(metadata.get(b'csv_size', -1))
+        csv_tail = metadata.get(b'csv_tail')
+
+        # A smaller CSV or a different line at csv_size means it was replaced,
+        # so the snapshot is stale
+        if (
+            0 < csv_size <= os.path.getsize(input_path)
+            and csv_tail is not None
+            and _line_before(input_path, csv_size) == csv_tail.decode()
+        ):
+            logger.info(f"Reading Parquet snapshot {parquet_path}...")
+            yield from pq.ParquetFile(parquet_path).iter_batches(columns=list(RAW_DTYPES))
+            yield from _iter_csv_from(input_path, csv_size)
+            return
+
+        logger.warning(f"Parquet snapshot {parquet_path} is stale, reading CSV instead")
+
+    yield from _open_raw_csv(input_path)
+
+def read_raw_prices(input_path: str, start_offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stream the raw data file and reduce each row to its timestamp and average price.
+    
+    Only one record batch of OHLC data is held at a time, so peak memory is
+    bounded by the two output arrays rather than the full raw frame.
+    
+    Args:
+        input_path: Path to the raw CSV file
+        start_offset: Byte offset of the first CSV row to read (default: whole file)
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: float64 timestamps and float32 prices,
+        excluding rows without a timestamp
+    """
+    ts_chunks, price_chunks = [], []
+    nan_count = 0
+
+    for batch in _iter_raw_batches(input_path, start_offset):
+        columns = {
+            name: np.asarray(batch.column(name).to_numpy(zero_copy_only=False), dtype=dtype)
+            for name, dtype in RAW_DTYPES.items()
+        }
+
+        # Check for and handle any NaN timestamps before computing anything
+        timestamps = columns['Timestamp']
+        valid = ~np.isnan(timestamps)
+        if not valid.all():
+            nan_count += int(valid.size - valid.sum())
+            columns = {name: values[valid] for name, values in columns.items()}
+
+        # Calculate the price as average of (high+low)/2 and (open+close)/2,
+        # which simplifies to (high+low+open+close)/4 accumulated in one buffer
+        price = np.add(columns['High'], columns['Low'])
+        price += columns['Open']
+        price += columns['Close']
+        price *= np.float32(0.25)
+
+        ts_chunks.append(columns['Timestamp'])
+        price_chunks.append(price)
+
+    if nan_count > 0:
+        logger.warning(f"Found {nan_count} NaN values in Timestamp column. Dropped these rows")
+
+    if not ts_chunks:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+    return np.concatenate(ts_chunks), np.concatenate(price_chunks)
+
+def _moving_averages(price: np.ndarray) -> List[np.ndarray]:
+    """
+    Compute the trailing 111-day and 350-day means of minute prices.
+    
+    Args:
+        price: Minute prices, possibly containing NaN
+        
+    Returns:
+        List[np.ndarray]: MA111 and MA350, NaN until each window fills
+    """
+    # Prefix sums let every window mean be a single subtraction. They are
+    # accumulated in float64 even though prices are float32, which keeps the
+    # error of each difference far below a cent over millions of rows.
+    missing = np.isnan(price)
+    has_missing = bool(missing.any())
+    csum = np.empty(price.size + 1)
+    csum[0] = 0.0
+    np.cumsum(np.where(missing, 0, price) if has_missing else price, dtype=np.float64, out=csum[1:])
+
+    # A missing price would otherwise poison every later prefix sum; count
+    # them separately so windows containing one come out NaN, as with
+    # rolling(window).mean()
+    if has_missing:
+        logger.warning(f"Found {int(missing.sum())} rows without a price")
+        missing_count = np.empty(price.size + 1, dtype=np.int64)
+        missing_count[0] = 0
+        np.cumsum(missing, out=missing_count[1:])
+
+    moving_averages = []
+    for window in (MA111_WINDOW, MA350_WINDOW):
+        ma = np.full(price.size, np.nan)
+        ma[window - 1:] = (csum[window:] - csum[:-window]) * (1.0 / window)
+        if has_missing:
+            ma[window - 1:][missing_count[window:] != missing_count[:-window]] = np.nan
+        moving_averages.append(ma)
+    return moving_averages
+
+def _write_processed_rows(f, timestamps: np.ndarray, price: np.ndarray, moving_averages: List[np.ndarray]):
+    """Write processed rows to a binary file handle with PyArrow's C++ CSV writer"""
+    # NaN moving averages become empty fields
+    table = pa.table(
+        [
+            pa.array(timestamps.astype(np.int64)),
+            pa.array(price, from_pandas=True),
+            *(pa.array(ma, from_pandas=True) for ma in moving_averages)
+        ],
+        names=PROCESSED_COLUMNS
+    )
+    pacsv.write_csv(
+        table, f,
+        write_options=pacsv.WriteOptions(
+            include_header=False, quoting_style='none', batch_size=65536
+        )
+    )
+
+def _line_before(path: str, offset: int) -> Optional[str]:
+    """Return the complete line ending exactly at byte offset, or None if there isn't one"""
+    with open(path, 'rb') as f:
+        start = max(0, offset - 4096)
+        f.seek(start)
+        chunk = f.read(offset - start)
+    if not chunk.endswith(b'\n'):
+        return None
+    return chunk[:-1].rsplit(b'\n', 1)[-1].decode()
+
+def _resume_offset(input_path: str, output_path: str, state: Optional[Dict]) -> int:
+    """
+    Check whether a previous run can be extended instead of redone.
+    
+    The raw CSV only ever grows by appended rows, so the previous run is still
+    valid if the line it ended on is unchanged. Anything else (a re-download,
+    a truncated output) means starting over.
+    
+    Returns:
+        int: Raw CSV byte offset to resume from, or 0 to reprocess everything
+    """
+    if not state or not os.path.exists(output_path):
+        return 0
+    input_size = state.get('input_size', 0)
+    if not 0 < input_size <= os.path.getsize(input_path):
+        return 0
+    if state.get('output_size', 0) > os.path.getsize(output_path):
+        return 0
+    tail = state.get('input_tail')
+    if tail is None or _line_before(input_path, input_size) != tail:
+        return 0
+    return input_size
+
+def _read_state(state_path: str) -> Optional[Dict]:
+    """Load the processing state sidecar, or None if it is missing or unreadable"""
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable state file {state_path}: {str(e)}")
+        return None
+    return state if isinstance(state, dict) else None
+
+def _write_state(state_path: str, input_path: str, input_stat: os.stat_result, output_size: int) -> None:
+    """Record which raw input the processed output was built from"""
+    # Write a temporary file and rename it so a crash never leaves a partial state
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'input_mtime_ns': input_stat.st_mtime_ns,
+            'input_size': input_stat.st_size,
+            'input_tail': _line_before(input_path, input_stat.st_size),
+            'output_size': output_size
+        }, f)
+    os.replace(tmp_path, state_path)
+
 def process_historical_data(input_path: str, output_path: str) -> bool:
     """
     Process historical Bitcoin data by calculating price and moving averages.
     
+    A <output_path>.state sidecar records how much of the raw file has been
+    processed, so later runs skip unchanged input and only process appended rows.
+    
     Args:
         input_path: Path to the raw CSV file
         output_path: Path where processed CSV should be saved
@@ -137,51 +469,120 @@ def process_historical_data(input_path: str, output_path: str) -> bool:
         bool: True if processing successful, False otherwise
     """
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        logger.info(f"Reading data from {input_path}...")
-        df = pd.read_csv(input_path)
-
-        # Calculate the price as average of (high+low)/2 and (open+close)/2
-        logger.info("Processing prices...")
-        df['price'] = (
-            ((df['High'] + df['Low']) / 2 + 
-             (df['Open'] + df['Close']) / 2) / 2
-        )
+        # Create output directory if it doesn't exist (a bare filename has none)
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
 
-        # Keep only timestamp and calculated price
-        result_df = df[['Timestamp']].copy()
-        result_df['price'] = df['price']
+        state_path = f"{output_path}.state"
+        state = _read_state(state_path)
 
-        # Add moving averages - multiply by minutes per day since data is minute-by-minute
-        logger.info("Calculating moving averages...")
-        minutes_per_day = 24 * 60  # 1440 minutes per day
-        result_df['MA111'] = df['price'].rolling(window=111 * minutes_per_day).mean()
-        result_df['MA350'] = df['price'].rolling(window=350 * minutes_per_day).mean()
+        # Skip all the work if the output was already built from this exact input
+        input_stat = os.stat(input_path)
+        if (
+            state and os.path.exists(output_path)
+            and state.get('input_mtime_ns') == input_stat.st_mtime_ns
+            and state.get('input_size') == input_stat.st_size
+        ):
+            logger.info("Raw data unchanged since last run. Skipping processing.")
+            return True
+
+        # Drop the stale marker first so a failed run can never be mistaken for a finished one
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+        start_offset = _resume_offset(input_path, output_path, state)
+        if start_offset == input_stat.st_size:
+            # Touched but not grown: keep the output and just record the new mtime
+            logger.info("No rows appended to raw data since last run. Skipping processing.")
+            _write_state(state_path, input_path, input_stat, state['output_size'])
+            return True
+
+        history = np.empty(0, dtype=np.float32)
+        if start_offset:
+            try:
+                # The new rows' windows reach back at most MA350_WINDOW - 1 prices
+                # into the previous run's output
+                history = _read_trailing_prices(
+                    output_path, MA350_WINDOW - 1, end=state['output_size']
+                ).astype(np.float32)
+                # Rows appended live since the last run are superseded by the raw data
+                with open(output_path, 'r+b') as f:
+                    f.truncate(state['output_size'])
+            except Exception as e:
+                logger.warning(f"Cannot resume from previous run, reprocessing everything: {str(e)}")
+                start_offset = 0
+                history = np.empty(0, dtype=np.float32)
 
-        # Check for and handle any NaN values before conversion
-        nan_count = result_df['Timestamp'].isna().sum()
-        if nan_count > 0:
-            logger.warning(f"Found {nan_count} NaN values in Timestamp column. Dropping these rows...")
-            result_df = result_df.dropna(subset=['Timestamp'])
+        if start_offset:
+            logger.info(f"Reading rows appended to {input_path} since the last run...")
+        else:
+            logger.info(f"Reading data from {input_path} and processing prices...")
+        timestamps, price = read_raw_prices(input_path, start_offset)
 
-        # Convert data types
-        result_df['Timestamp'] = result_df['Timestamp'].astype(int)
-        result_df['price'] = result_df['price'].astype(float)
+        # Prepend the previous prices so the new rows get full windows
+        logger.info("Calculating moving averages...")
+        moving_averages = [
+            ma[history.size:] for ma in _moving_averages(np.concatenate([history, price]))
+        ]
 
-        # Save to new CSV
+        # Write the columns straight to CSV instead of formatting rows in Python
         logger.info(f"Saving processed data to {output_path}...")
-        result_df.to_csv(output_path, index=False)
+        if start_offset:
+            with open(output_path, 'ab') as f:
+                _write_processed_rows(f, timestamps, price, moving_averages)
+        else:
+            with open(output_path, 'wb') as f:
+                f.write((','.join(PROCESSED_COLUMNS) + '\n').encode())
+                _write_processed_rows(f, timestamps, price, moving_averages)
 
-        logger.info(f"Done! Processed {len(result_df)} rows")
+        _write_state(state_path, input_path, input_stat, os.path.getsize(output_path))
+
+        logger.info(f"Done! Processed {len(timestamps)} rows")
         return True
         
     except Exception as e:
         logger.error(f"Error processing historical data: {str(e)}")
         return False
     
-def load_initial_prices(processed_data_path: str, days: int = 350) -> List[float]:
+def _read_trailing_prices(path: str, count: int, end: Optional[int] = None) -> np.ndarray:
+    """
+    Read the last prices of a processed CSV without reading the whole file.
+    
+    Args:
+        path: Path to the processed CSV file
+        count: Number of trailing prices to read
+        end: Line-aligned byte offset to treat as the end of the file (default: its size)
+        
+    Returns:
+        np.ndarray: float64 array of up to count prices, fewer if the file is shorter
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size if end is None else end
+        
+        # Read only the last portion of the file, widening the window if the
+        # byte estimate turns out to be too small
+        span = count * 64
+        while True:
+            offset = max(0, size - span)
+            f.seek(offset)
+            if offset > 0:
+                f.readline()  # Discard the partial line we landed in
+
+            df = pd.read_csv(
+                io.BytesIO(f.read(size - f.tell())),
+                header=None if offset > 0 else 0,
+                names=PROCESSED_COLUMNS,
+                usecols=['price'],
+                dtype={'price': np.float64}
+            )
+            if len(df) >= count or offset == 0:
+                break
+            span *= 2
+    
+    return df['price'].to_numpy()[-count:]
+
+def load_initial_prices(processed_data_path: str, days: int = 350) -> np.ndarray:
     """
     Load the most recent prices from the processed data file for initializing PriceManager.
     
@@ -190,7 +591,7 @@ def load_initial_prices(processed_data_path: str, days: int = 350) -> List[float
         days: Number of days of historical data to load (default: 350)
         
     Returns:
-        List[float]: List of prices for the specified number of days
+        np.ndarray: float64 array of prices for the specified number of days
         
     Raises:
         FileNotFoundError: If the processed data file doesn't exist
@@ -200,18 +601,15 @@ def load_initial_prices(processed_data_path: str, days: int = 350) -> List[float
         logger.info(f"Loading last {days} days of price data...")
         
         # Calculate number of minutes needed
-        minutes_needed = days * 24 * 60
+        minutes_needed = days * MINUTES_PER_DAY
+        prices = _read_trailing_prices(processed_data_path, minutes_needed)
         
-        # Read only the last portion of the file
-        df = pd.read_csv(processed_data_path).tail(minutes_needed)
-        
-        if len(df) < minutes_needed:
+        if len(prices) < minutes_needed:
             raise ValueError(
                 f"Not enough data in file. Need {minutes_needed} minutes "
-                f"but only found {len(df)} records"
+                f"but only found {len(prices)} records"
             )
         
-        prices = df['price'].tolist()[-minutes_needed:]
         logger.info(f"Successfully loaded {len(prices)} price points")
         
         return prices
@@ -220,6 +618,36 @@ def load_initial_prices(processed_data_path: str, days: int = 350) -> List[float
         logger.error(f"Error loading initial prices: {str(e)}")
         raise
 
+def _read_last_timestamps(path: str, n: int = 10) -> List[int]:
+    """
+    Parse the Timestamp field of the last rows of a CSV without reading the whole file.
+    
+    Args:
+        path: Path to the CSV file
+        n: Number of trailing non-empty rows to inspect
+        
+    Returns:
+        List[int]: Valid timestamps among those rows, newest first
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        offset = max(0, size - 4096)
+        f.seek(offset)
+        lines = [line for line in f.read().splitlines() if line.strip()]
+
+    # The first line is likely partial unless we read from the start
+    if offset > 0:
+        lines = lines[1:]
+
+    timestamps = []
+    for line in lines[::-1][:n]:
+        try:
+            timestamps.append(int(float(line.split(b',', 1)[0])))
+        except ValueError:
+            continue
+    return timestamps
+
 def get_missing_data(raw_data_path: str) -> bool:
     """
     Fetch missing data between the last timestamp in historical data and current time
@@ -233,17 +661,11 @@ def get_missing_data(raw_data_path: str) -> bool:
     """
     logger.info("Reading last timestamp from historical data file...")
 
-    # Read the last valid timestamp from the raw data file
-    df = pd.read_csv(raw_data_path)
     # Check last 10 rows for valid timestamp, starting from the end
-    for i in range(10):
-        try:
-            last_timestamp = int(df['Timestamp'].iloc[-(i+1)])
-            break
-        except (ValueError, TypeError):
-            continue
-    else:
+    timestamps = _read_last_timestamps(raw_data_path, n=10)
+    if not timestamps:
         raise ValueError("Could not find valid timestamp in last 10 rows")
+    last_timestamp = timestamps[0]
 
     current_timestamp = int(datetime.now(timezone.utc).timestamp())
 
@@ -269,7 +691,7 @@ def get_missing_data(raw_data_path: str) -> bool:
     
     logger.info("Making API request to CoinGecko...")
     try:
-        response = requests.get(url, params=params)
+        response = http_session.get(url, params=params)
         if response.status_code != 200:
             logger.error(f"CoinGecko API returned status code {response.status_code}")
             raise Exception(f"API Error: {response.text}")
@@ -283,7 +705,6 @@ def get_missing_data(raw_data_path: str) -> bool:
         return False
 
     prices = data.get('prices', [])  # [[timestamp, price], ...]
-    market_caps = data.get('market_caps', [])  # [[timestamp, market_cap], ...]
     volumes = data.get('total_volumes', [])  # [[timestamp, volume], ...]
     
     if not prices:
@@ -291,40 +712,33 @@ def get_missing_data(raw_data_path: str) -> bool:
         return True
         
     logger.info(f"Processing {len(prices)} new data points...")
-    new_data = []
     try:
-        for i in range(len(prices)):
-            ts_ms, price = prices[i]
-            _, market_cap = market_caps[i]
-            _, volume = volumes[i]
-            
-            # Convert millisecond timestamp to second timestamp
-            ts = int(ts_ms / 1000)
-            
-            new_data.append({
-                'Timestamp': ts,
-                'Open': price,
-                'High': price,
-                'Low': price,
-                'Close': price,
-                #'Volume_(BTC)': volume / price if price > 0 else 0,  # Convert USD volume to BTC
-                'Volume': volume,
-                #'Weighted_Price': price
-            })
+        price_arr = np.asarray(prices, dtype=np.float64)
+        volume_arr = np.asarray(volumes, dtype=np.float64)
+
+        # Convert millisecond timestamps to second timestamps
+        ts = (price_arr[:, 0] / 1000).astype(np.int64)
+        price = price_arr[:, 1]
+
+        new_df = pd.DataFrame({
+            'Timestamp': ts,
+            'Open': price,
+            'High': price,
+            'Low': price,
+            'Close': price,
+            'Volume': volume_arr[:, 1],
+        })
     except (IndexError, ValueError, TypeError) as e:
         logger.error(f"Error processing API response data: {str(e)}")
         return False
     
-    if new_data:
-        logger.info("Converting new data to DataFrame...")
-        try:
-            # Convert to DataFrame and append to existing file
-            new_df = pd.DataFrame(new_data)
-            logger.info(f"Appending {len(new_data)} records to {raw_data_path}")
-            new_df.to_csv(raw_data_path, mode='a', header=False, index=False)
-            logger.info(f"Successfully added {len(new_data)} new records to historical data")
-        except (IOError, OSError) as e:
-            logger.error(f"Failed to write new data to file: {str(e)}")
-            return False
+    try:
+        # Append new data to existing file
+        logger.info(f"Appending {len(new_df)} records to {raw_data_path}")
+        new_df.to_csv(raw_data_path, mode='a', header=False, index=False)
+        logger.info(f"Successfully added {len(new_df)} new records to historical data")
+    except (IOError, OSError) as e:
+        logger.error(f"Failed to write new data to file: {str(e)}")
+        return False
     
     return True
\ No newline at end of file